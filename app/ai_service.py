@@ -1,221 +1,601 @@
 import google.generativeai as genai
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 from .models import Question, QuestionType, DifficultyLevel, Resume
+from .cache import PromptCache
 import json
+import orjson
 import re
+import asyncio
+import logging
+from itertools import islice
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
 
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# One shared model object so all services reuse the same client transport.
+# JSON mode needs a Gemini 1.5+ model; gemini-pro rejects response_mime_type.
+_MODEL = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+
+_JSON_CONFIG = {"response_mime_type": "application/json"}
+_STRICT_JSON_CONFIG = {"response_mime_type": "application/json", "temperature": 0}
+
+prompt_cache = PromptCache(maxsize=1024, ttl=3600)
+# Response analyses get their own cache so hint and question prompts can't evict them
+analysis_cache = PromptCache(maxsize=10000, ttl=3600)
+
+async def _generate(model, prompt: str, parse=None, generation_config: Dict = None, cache: PromptCache = prompt_cache):
+    """
+    Run a prompt through Gemini, serving repeated prompts from the given cache.
+    With a parse callable the parsed result is cached; empty results are never cached.
+    """
+    key = PromptCache.make_key(prompt, repr(generation_config))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    
+    response = await model.generate_content_async(prompt, generation_config=generation_config)
+    result = parse(response.text) if parse else response.text.strip()
+    if result:
+        cache.set(key, result)
+    return result
+
+async def _stream(model, prompt: str):
+    """
+    Yield Gemini's text chunks as they are generated and cache the full text once complete.
+    A cached prompt is yielded in one piece.
+    """
+    key = PromptCache.make_key(prompt, repr(None))
+    cached = prompt_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    response = await model.generate_content_async(prompt, stream=True)
+    parts = []
+    async for chunk in response:
+        parts.append(chunk.text)
+        yield chunk.text
+    
+    text = "".join(parts).strip()
+    if text:
+        prompt_cache.set(key, text)
+
+async def _stream_with_fallback(model, prompt: str, fallback: str):
+    emitted = False
+    try:
+        async for text in _stream(model, prompt):
+            emitted = True
+            yield text
+    except Exception as e:
+        logger.warning("Streaming generation error: %s", e)
+        if not emitted:
+            yield fallback
+
+_JSON_DECODER = json.JSONDecoder()
+
+def _extract_json(text: str, opener: str):
+    """
+    Decode the first JSON value opening with `opener` ('[' or '{') embedded in text.
+    Parses in place from the offset instead of regex-slicing and re-scanning the text.
+    """
+    start = text.find(opener)
+    if start == -1:
+        return None
+    
+    # JSON-mode replies are a bare document: let orjson parse it in one pass
+    if not text[:start].strip():
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    
+    # Otherwise the JSON is embedded in prose; stdlib raw_decode can stop at the end of the value
+    while start != -1:
+        try:
+            value, _ = _JSON_DECODER.raw_decode(text, start)
+            return value
+        except json.JSONDecodeError:
+            start = text.find(opener, start + 1)
+    
+    logger.debug("No JSON value found in Gemini response: %.200s", text)
+    return None
+
+# Question-generation prompts keep their long instructions as a byte-identical prefix and put
+# the per-request values at the end, so provider-side prompt caching can reuse the prefix
+_TECH_PROMPT_TMPL = """Generate technical interview questions for a candidate with the skills listed at the end.
+
+For each skill, create 1-2 questions that test:
+- Practical knowledge and application
+- Problem-solving abilities
+- Real-world usage scenarios
+
+Difficulty levels:
+- entry: Basic concepts, definitions, simple usage
+- mid: Implementation details, best practices, debugging
+- senior: Architecture decisions, optimization, leadership in technical choices
+
+Return response as JSON array with format:
+[{{
+    "question": "question text",
+    "skill": "related skill",
+    "expected_points": ["point1", "point2", "point3"],
+    "follow_up": "follow up question"
+}}]
+
+Difficulty level: {difficulty}
+Skills: {skills}
+"""
+
+_BEHAV_PROMPT_TMPL = """Generate 3 behavioral interview questions for a candidate using STAR method.
+
+Focus areas based on difficulty:
+- entry: Learning ability, teamwork, basic problem-solving
+- mid: Leadership potential, conflict resolution, project management
+- senior: Strategic thinking, mentoring, organizational impact
+
+Return response as JSON array with format:
+[{{
+    "question": "question text",
+    "focus_area": "area being tested",
+    "expected_points": ["point1", "point2", "point3"],
+    "follow_up": "follow up question"
+}}]
+
+Difficulty level: {difficulty}
+"""
+
+_EXP_PROMPT_TMPL = """Based on the work experiences listed at the end, generate specific interview questions.
+
+Create questions that:
+- Dive deep into specific projects and responsibilities
+- Test problem-solving and decision-making
+- Explore achievements and challenges
+
+Difficulty considerations:
+- entry: Focus on learning and contribution
+- mid: Focus on independence and problem-solving
+- senior: Focus on leadership and strategic impact
+
+Return response as JSON array with format:
+[{{
+    "question": "question text",
+    "experience_focus": "which experience this targets",
+    "expected_points": ["point1", "point2", "point3"],
+    "follow_up": "follow up question"
+}}]
+
+Difficulty level: {difficulty}
+Experiences:
+{experiences}
+"""
+
+_BATCH_PROMPT_TMPL = """Generate interview questions for a candidate, grouped into the sections requested at the end.
+
+Sections:
+- technical: 3 questions testing practical knowledge, problem-solving and real-world usage of the listed skills
+- behavioral: 3 questions using the STAR method
+- experience: 2 questions diving into the projects, decisions and achievements in the listed experiences
+
+Difficulty levels:
+- entry: Basic concepts, learning ability, teamwork and contribution
+- mid: Implementation details, best practices, independence and conflict resolution
+- senior: Architecture decisions, strategic thinking, mentoring and leadership
+
+Return response as a JSON object with one key per requested section, each holding an array with format:
+[{{
+    "question": "question text",
+    "expected_points": ["point1", "point2", "point3"],
+    "follow_up": "follow up question"
+}}]
+
+Difficulty level: {difficulty}
+Requested sections: {sections}
+{details}
+"""
+
+# Conversation prompts follow the same layout: instructions first, then the question being asked,
+# then the dialogue tail and the candidate's answer, which change on every turn
+_ADAPT_PROMPT_TMPL = """You are an elite corporate technical and behavioral interviewer. You are transitioning the candidate to the next question.
+
+Your Goal:
+Rewrite the "Next Question Template" given below to create a highly professional, adaptive next question.
+1. Start with a natural, brief conversational transition acknowledging the candidate's last answer/points. (Do not say "Excellent job" or sound robotic; make it organic like a human interviewer. e.g. "That makes sense, especially regarding how you handle concurrency. Pivoting a bit...")
+2. Introduce the core topic of the Next Question Template. You may slightly tailor the context of the question to match the candidate's resume skills if it makes the question more relevant.
+3. Do NOT change the target difficulty or the core concept of the original question.
+4. Keep the question concise and clear (maximum 2-3 sentences).
+5. CRITICAL CONSTRAINT: If the candidate's last response was off-topic, unrelated, or skipped, do NOT attempt to connect it to the next question. Instead, use a standard transition like "Moving on to the next question..." and ask the next question exactly as templated, without any tailoring to the off-topic subject.
+6. CRITICAL CONSTRAINT: The rewritten question MUST be a professional interview question focusing entirely on the technical or behavioral topic of the "Next Question Template". Never ask about non-professional, general knowledge, or off-topic subjects.
+
+Return response in this JSON format:
+{{
+    "question_text": "The rewritten question text with transition",
+    "expected_answer_points": ["point1", "point2", "point3"]
+}}
+
+Next Question Template: "{question_text}"
+Next Question Type: "{question_type}"
+Next Question Difficulty: "{difficulty}"
+Candidate Resume Skills: {skills}
+
+Recent Dialogue History:
+{context}
+
+Last Candidate Response: "{user_response}"
+"""
+
+_ANSWER_PROMPT_TMPL = """You are an experienced, adaptive AI interviewer analyzing a candidate's response. Be conversational, supportive, but honest in your analysis.
+
+Analyze the candidate's answer given at the end and determine the most appropriate next action. Return JSON in this exact format:
+{{
+    "action": "continue|follow_up|provide_feedback|encourage_more|correct_misunderstanding|move_next",
+    "response_quality": "excellent|good|fair|poor|off_topic|wrong",
+    "is_relevant": true/false,
+    "completeness_score": 1-10,
+    "accuracy_score": 1-10,
+    "needs_follow_up": true/false,
+    "ai_response": "What you should say next - be conversational and adaptive",
+    "follow_up_question": "Specific follow-up question if needed",
+    "feedback": "Brief encouraging feedback",
+    "next_action": "continue_listening|move_to_next_question"
+}}
+
+AI Response Guidelines & Strict Context Constraints:
+- CRITICAL CONSTRAINT: Under no circumstances should you engage in chit-chat, talk about unrelated topics (such as food/cooking, recipes, sports, hobbies, movies, weather, etc.), or answer unrelated questions.
+- OFF-TOPIC DEFINITION: Any response that does not attempt to answer the current interview question or talks about unrelated concepts (e.g., food/cooking, sports, hobbies, personal chit-chat, asking the interviewer personal/philosophical questions) is strictly OFF-TOPIC.
+- If the candidate's answer is OFF-TOPIC: You must set "action" to "redirect_off_topic", set "response_quality" to "off_topic", set "needs_follow_up" to true, and set "ai_response" to a polite but firm redirection back to the active interview question. e.g., "I see. Let's make sure we stay focused on our interview topic. To get back on track, let me repeat the question: [repeat question]"
+- Keep all follow-up questions strictly scoped to the active interview question's technical/behavioral domain. Do not deviate to any unrelated topics.
+- If answer is WRONG or POOR: Provide gentle correction, explain the right approach, then ask a clarifying question
+- If answer is INCOMPLETE: Ask for more details or examples
+- If answer is GOOD/EXCELLENT: Acknowledge strengths and move forward
+- Be conversational and natural, like a real interviewer
+- Show you're listening by referencing their specific points
+- For wrong answers, say something like: "I appreciate your effort, but let me help clarify this concept..." or "That's not quite right, let me explain..."
+- For good answers: "Excellent point about...", "That's a solid approach..."
+- Adapt your language to match the candidate's communication style
+
+Current Question: {question}
+{question_info}
+Recent Conversation Context:
+{context}
+
+Candidate's Answer: {user_response}
+"""
+
+_ANALYSIS_PROMPT_TMPL = """Analyze the interview response given at the end comprehensively.
+
+Provide analysis in JSON format:
+{{
+    "completeness_score": 0-10,
+    "accuracy_score": 0-10,
+    "clarity_score": 0-10,
+    "relevance_score": 0-10,
+    "depth_score": 0-10,
+    "missing_points": ["point1", "point2"],
+    "strengths": ["strength1", "strength2"],
+    "areas_for_improvement": ["improvement1", "improvement2"],
+    "overall_feedback": "Comprehensive feedback summary",
+    "follow_up_needed": true/false,
+    "suggested_follow_up": "follow up question if needed"
+}}
+
+Question: {question}
+Expected Key Points: {expected_points}
+
+Response: {user_response}
+"""
+
+# Resume experience lines are free text; cap each one so prompt size stays bounded
+_MAX_EXPERIENCE_CHARS = 500
+
+# Fallback question templates used when Gemini is unavailable, keyed by difficulty
+_FALLBACK_TECHNICAL = {
+    DifficultyLevel.ENTRY: (
+        "What is {skill} and how have you used it?",
+        "Can you explain a simple project you built with {skill}?"
+    ),
+    DifficultyLevel.MID: (
+        "Describe a challenging problem you solved using {skill}",
+        "How do you ensure code quality when working with {skill}?"
+    ),
+    DifficultyLevel.SENIOR: (
+        "How would you architect a large-scale system using {skill}?",
+        "What are the performance considerations when using {skill}?"
+    )
+}
+
+_FALLBACK_BEHAVIORAL = {
+    DifficultyLevel.ENTRY: (
+        "Tell me about a time you learned something new quickly",
+        "Describe a situation where you worked effectively in a team",
+        "How do you handle feedback and criticism?"
+    ),
+    DifficultyLevel.MID: (
+        "Tell me about a time you had to lead a project or initiative",
+        "Describe a situation where you had to resolve a conflict",
+        "How do you prioritize tasks when facing multiple deadlines?"
+    ),
+    DifficultyLevel.SENIOR: (
+        "Tell me about a time you made a strategic decision that impacted your team",
+        "Describe how you mentor and develop junior team members",
+        "How do you handle situations where you disagree with senior management?"
+    )
+}
+
+# Word-count bands for the fallback scorers: bisect_right(bounds, word_count) picks the band
+_FALLBACK_INTELLIGENT_BOUNDS = (5, 15)
+_FALLBACK_INTELLIGENT_RESULTS = (
+    {
+        "action": "provide_feedback",
+        "response": "I can see you're uncertain about this. Let me help clarify the concept and give you another chance to think about it. This is a common area that many candidates find challenging.",
+        "continue_listening": True,
+        "needs_follow_up": True,
+        "response_quality": "poor"
+    },
+    {
+        "action": "encourage_more", 
+        "response": "That's a good start! I can see you understand some aspects. Could you elaborate more and perhaps give me a specific example or walk me through your thought process?",
+        "continue_listening": True,
+        "needs_follow_up": True,
+        "response_quality": "fair"
+    },
+    {
+        "action": "continue",
+        "response": "Thank you for that comprehensive answer. I can see you have good knowledge in this area and you've explained your thinking clearly.",
+        "continue_listening": False,
+        "needs_follow_up": False,
+        "response_quality": "good"
+    }
+)
+
+# (completeness, clarity, depth) per band
+_FALLBACK_SCORE_BOUNDS = (10, 30, 60)
+_FALLBACK_SCORES = ((3, 4, 2), (6, 7, 5), (8, 8, 7), (9, 8, 8))
+
+# (question type, id prefix, max questions) for each section of the batched generation call
+_BATCH_SECTIONS = (
+    (QuestionType.TECHNICAL, "tech", 3),
+    (QuestionType.BEHAVIORAL, "behavioral", 3),
+    (QuestionType.EXPERIENCE, "exp", 2),
+)
+
+# Conversational intents in priority order: when several phrases match, the earliest intent wins
+_INTENT_PHRASES = (
+    ("confirm_end_interview", ('end the interview', 'stop the interview', 'terminate', 'quit', 'finish early', 'leave the interview', 'stop now', 'can we end', 'i want to end', 'exit interview')),
+    ("provide_hint", ('hint', 'give me a hint', 'clue', 'help me with this', 'stuck', 'give me a clue', 'any tips')),
+    ("repeat_question", ('repeat', 'again', 'say that again', 'repeat question', 'what was the question', 'can you repeat')),
+    ("clarify_question", ('clarify', 'explain', 'what do you mean', 'unclear', 'confused', 'don\'t understand', 'rephrase')),
+    ("skip_question", ('skip', 'next question', 'pass', 'i don\'t know', 'no idea', 'not sure')),
+    ("adjust_pace", ('slow down', 'too fast', 'speak slower')),
+    ("provide_example", ('example', 'give me an example', 'for instance', 'what do you mean by'))
+)
+_INTENT_PRIORITY = {action: rank for rank, (action, _) in enumerate(_INTENT_PHRASES)}
+_PHRASE_TO_ACTION = {}
+for _action, _phrases in _INTENT_PHRASES:
+    for _phrase in _phrases:
+        _PHRASE_TO_ACTION.setdefault(_phrase, _action)
+
+# Zero-width lookahead reports overlapping phrases too; alternatives are tried in priority order
+_INTENT_RE = re.compile("(?=(" + "|".join(map(re.escape, _PHRASE_TO_ACTION)) + "))")
+_CONFIRM_END_RE = re.compile("|".join(map(re.escape, ['yes', 'yep', 'yeah', 'sure', 'confirm', 'end', 'stop', 'correct', 'do it'])))
+
+# Common wrong answer indicators for the fallback analysis
+_UNCERTAIN_RE = re.compile(r'i dont know|no idea|not sure|maybe|i think|probably')
+
+def _match_intent(text: str) -> Optional[str]:
+    best = None
+    for match in _INTENT_RE.finditer(text):
+        action = _PHRASE_TO_ACTION[match.group(1)]
+        if best is None or _INTENT_PRIORITY[action] < _INTENT_PRIORITY[best]:
+            best = action
+            if _INTENT_PRIORITY[best] == 0:
+                break
+    return best
+
+def _recent_messages(history: Sequence[Dict], count: int) -> List[Dict]:
+    """
+    Last `count` messages of a conversation list or bounded deque, without copying the whole history
+    """
+    return list(islice(reversed(history), count))[::-1]
+
+def question_context(question: Dict) -> Dict:
+    """
+    Static per-question context for ConversationManager prompts; the conversation itself is passed separately
+    """
+    return {
+        "question_type": question.get("question_type"),
+        "difficulty": question.get("difficulty"),
+        "expected_answer_points": question.get("expected_answer_points", [])
+    }
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.split())
+
 class AIQuestionGenerator:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model = _MODEL
     
     async def generate_questions(self, resume_data: Dict, config: Dict) -> List[Question]:
-        questions = []
-        
-        if QuestionType.TECHNICAL in config.get('question_types', []):
-            tech_questions = await self._generate_technical_questions(
-                resume_data.get('skills', []), 
-                config['difficulty']
-            )
-            questions.extend(tech_questions)
+        question_types = config.get('question_types', [])
+        difficulty = config['difficulty']
         
-        if QuestionType.BEHAVIORAL in config.get('question_types', []):
-            behavioral_questions = await self._generate_behavioral_questions(
-                config['difficulty']
-            )
-            questions.extend(behavioral_questions)
+        try:
+            generated = await self._generate_all_questions(resume_data, config)
+        except Exception as e:
+            logger.warning("Batched question generation error: %s", e)
+            generated = {}
+        
+        if generated is None:
+            # Gemini answered twice without usable JSON; more calls are unlikely to fare better
+            logger.warning("Batched question generation returned unparseable JSON, using fallback questions")
+            fallback_generators = {
+                QuestionType.TECHNICAL: lambda: self._fallback_technical_questions(resume_data.get('skills', []), difficulty),
+                QuestionType.BEHAVIORAL: lambda: self._fallback_behavioral_questions(difficulty),
+                QuestionType.EXPERIENCE: lambda: self._fallback_experience_questions(resume_data.get('experience', []), difficulty)
+            }
+            questions = [q for question_type, generate in fallback_generators.items() if question_type in question_types for q in generate()]
+            return questions[:config.get('num_questions', 5)]
+        
+        # Fall back to the per-type generators, concurrently, for any section the batched call missed
+        per_type_generators = {
+            QuestionType.TECHNICAL: lambda: self._generate_technical_questions(resume_data.get('skills', []), difficulty),
+            QuestionType.BEHAVIORAL: lambda: self._generate_behavioral_questions(difficulty),
+            QuestionType.EXPERIENCE: lambda: self._generate_experience_questions(resume_data.get('experience', []), difficulty)
+        }
+        missing = [t for t in per_type_generators if t in question_types and not generated.get(t)]
+        results = await asyncio.gather(*(per_type_generators[t]() for t in missing), return_exceptions=True)
         
-        if QuestionType.EXPERIENCE in config.get('question_types', []):
-            exp_questions = await self._generate_experience_questions(
-                resume_data.get('experience', []), 
-                config['difficulty']
-            )
-            questions.extend(exp_questions)
+        for question_type, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logger.warning("Question generation error: %s", result)
+                continue
+            generated[question_type] = result
         
+        questions = [q for question_type in per_type_generators if question_type in question_types for q in generated.get(question_type, [])]
         return questions[:config.get('num_questions', 5)]
     
+    async def _generate_all_questions(self, resume_data: Dict, config: Dict) -> Optional[Dict[QuestionType, List[Question]]]:
+        """
+        Generate every requested question type with a single Gemini call.
+        Returns None when Gemini's reply stays unparseable after the strict retry
+        """
+        question_types = config.get('question_types', [])
+        difficulty = config['difficulty']
+        skills = resume_data.get('skills', [])
+        experiences = resume_data.get('experience', [])
+        
+        sections = []
+        details = []
+        if QuestionType.TECHNICAL in question_types and skills:
+            sections.append(QuestionType.TECHNICAL.value)
+            details.append(f"Skills: {', '.join(skills[:5])}")
+        if QuestionType.BEHAVIORAL in question_types:
+            sections.append(QuestionType.BEHAVIORAL.value)
+        if QuestionType.EXPERIENCE in question_types and experiences:
+            sections.append(QuestionType.EXPERIENCE.value)
+            details.append("Experiences:\n" + "\n".join(exp[:_MAX_EXPERIENCE_CHARS] for exp in experiences[:3]))
+        
+        if not sections:
+            return {}
+        
+        prompt = _BATCH_PROMPT_TMPL.format_map({
+            'difficulty': DifficultyLevel(difficulty).value,
+            'sections': ', '.join(sections),
+            'details': '\n'.join(details)
+        })
+        
+        data = await self._generate_json(prompt, self._parse_single_json_response)
+        if not data:
+            return None
+        
+        generated = {}
+        for question_type, prefix, limit in _BATCH_SECTIONS:
+            if question_type.value not in sections:
+                continue
+            items = data.get(question_type.value)
+            if isinstance(items, list):
+                generated[question_type] = self._to_questions(items[:limit], prefix, question_type, difficulty)
+        return generated
+    
+    async def _generate_json(self, prompt: str, parse):
+        """
+        An empty parse means Gemini answered with unusable JSON rather than failing outright,
+        so retry once with deterministic sampling before the caller falls back.
+        API errors propagate so the caller can fall back immediately.
+        """
+        data = await _generate(self.model, prompt, parse, _JSON_CONFIG)
+        if not data:
+            logger.debug("Unparseable JSON from Gemini, retrying with strict generation config")
+            data = await _generate(self.model, prompt, parse, _STRICT_JSON_CONFIG)
+        return data
+    
+    def _to_questions(self, questions_data: List[Dict], prefix: str, question_type: QuestionType, difficulty: DifficultyLevel) -> List[Question]:
+        return [
+            Question(
+                id=f"{prefix}_{i}",
+                question_text=q_data.get('question', ''),
+                question_type=question_type,
+                difficulty=difficulty,
+                expected_answer_points=q_data.get('expected_points', []),
+                follow_up_questions=[q_data.get('follow_up', '')]
+            )
+            for i, q_data in enumerate(questions_data)
+        ]
+    
     async def _generate_technical_questions(self, skills: List[str], difficulty: DifficultyLevel) -> List[Question]:
         if not skills:
             return []
         
-        prompt = f"""
-        Generate technical interview questions for a {difficulty} level candidate with skills: {', '.join(skills[:5])}
-        
-        For each skill, create 1-2 questions that test:
-        - Practical knowledge and application
-        - Problem-solving abilities
-        - Real-world usage scenarios
-        
-        Difficulty levels:
-        - entry: Basic concepts, definitions, simple usage
-        - mid: Implementation details, best practices, debugging
-        - senior: Architecture decisions, optimization, leadership in technical choices
-        
-        Return response as JSON array with format:
-        [{{
-            "question": "question text",
-            "skill": "related skill",
-            "expected_points": ["point1", "point2", "point3"],
-            "follow_up": "follow up question"
-        }}]
-        """
+        prompt = _TECH_PROMPT_TMPL.format_map({
+            'difficulty': DifficultyLevel(difficulty).value,
+            'skills': ', '.join(skills[:5])
+        })
         
         try:
-            response = self.model.generate_content(prompt)
-            questions_data = self._parse_json_response(response.text)
-            
-            questions = []
-            for i, q_data in enumerate(questions_data[:3]):
-                question = Question(
-                    id=f"tech_{i}",
-                    question_text=q_data.get('question', ''),
-                    question_type=QuestionType.TECHNICAL,
-                    difficulty=difficulty,
-                    expected_answer_points=q_data.get('expected_points', []),
-                    follow_up_questions=[q_data.get('follow_up', '')]
-                )
-                questions.append(question)
-            
-            return questions
+            questions_data = await self._generate_json(prompt, self._parse_json_response)
+            if questions_data:
+                return self._to_questions(questions_data[:3], "tech", QuestionType.TECHNICAL, difficulty)
         except Exception as e:
-            return self._fallback_technical_questions(skills, difficulty)
+            logger.warning("Technical question generation failed: %s", e)
+        
+        return self._fallback_technical_questions(skills, difficulty)
     
     async def _generate_behavioral_questions(self, difficulty: DifficultyLevel) -> List[Question]:
-        prompt = f"""
-        Generate behavioral interview questions for a {difficulty} level candidate using STAR method.
-        
-        Focus areas based on difficulty:
-        - entry: Learning ability, teamwork, basic problem-solving
-        - mid: Leadership potential, conflict resolution, project management
-        - senior: Strategic thinking, mentoring, organizational impact
-        
-        Return response as JSON array with format:
-        [{{
-            "question": "question text",
-            "focus_area": "area being tested",
-            "expected_points": ["point1", "point2", "point3"],
-            "follow_up": "follow up question"
-        }}]
-        
-        Generate 3 questions.
-        """
+        prompt = _BEHAV_PROMPT_TMPL.format_map({'difficulty': DifficultyLevel(difficulty).value})
         
         try:
-            response = self.model.generate_content(prompt)
-            questions_data = self._parse_json_response(response.text)
-            
-            questions = []
-            for i, q_data in enumerate(questions_data[:3]):
-                question = Question(
-                    id=f"behavioral_{i}",
-                    question_text=q_data.get('question', ''),
-                    question_type=QuestionType.BEHAVIORAL,
-                    difficulty=difficulty,
-                    expected_answer_points=q_data.get('expected_points', []),
-                    follow_up_questions=[q_data.get('follow_up', '')]
-                )
-                questions.append(question)
-            
-            return questions
+            questions_data = await self._generate_json(prompt, self._parse_json_response)
+            if questions_data:
+                return self._to_questions(questions_data[:3], "behavioral", QuestionType.BEHAVIORAL, difficulty)
         except Exception as e:
-            return self._fallback_behavioral_questions(difficulty)
+            logger.warning("Behavioral question generation failed: %s", e)
+        
+        return self._fallback_behavioral_questions(difficulty)
     
     async def _generate_experience_questions(self, experiences: List[str], difficulty: DifficultyLevel) -> List[Question]:
         if not experiences:
             return []
         
-        prompt = f"""
-        Based on these work experiences, generate specific questions for a {difficulty} level interview:
-        
-        Experiences:
-        {chr(10).join(experiences[:3])}
-        
-        Create questions that:
-        - Dive deep into specific projects and responsibilities
-        - Test problem-solving and decision-making
-        - Explore achievements and challenges
-        
-        Difficulty considerations:
-        - entry: Focus on learning and contribution
-        - mid: Focus on independence and problem-solving
-        - senior: Focus on leadership and strategic impact
-        
-        Return response as JSON array with format:
-        [{{
-            "question": "question text",
-            "experience_focus": "which experience this targets",
-            "expected_points": ["point1", "point2", "point3"],
-            "follow_up": "follow up question"
-        }}]
-        """
+        prompt = _EXP_PROMPT_TMPL.format_map({
+            'difficulty': DifficultyLevel(difficulty).value,
+            'experiences': '\n'.join(exp[:_MAX_EXPERIENCE_CHARS] for exp in experiences[:3])
+        })
         
         try:
-            response = self.model.generate_content(prompt)
-            questions_data = self._parse_json_response(response.text)
-            
-            questions = []
-            for i, q_data in enumerate(questions_data[:2]):
-                question = Question(
-                    id=f"exp_{i}",
-                    question_text=q_data.get('question', ''),
-                    question_type=QuestionType.EXPERIENCE,
-                    difficulty=difficulty,
-                    expected_answer_points=q_data.get('expected_points', []),
-                    follow_up_questions=[q_data.get('follow_up', '')]
-                )
-                questions.append(question)
-            
-            return questions
+            questions_data = await self._generate_json(prompt, self._parse_json_response)
+            if questions_data:
+                return self._to_questions(questions_data[:2], "exp", QuestionType.EXPERIENCE, difficulty)
         except Exception as e:
-            return self._fallback_experience_questions(experiences, difficulty)
+            logger.warning("Experience question generation failed: %s", e)
+        
+        return self._fallback_experience_questions(experiences, difficulty)
 
     async def adapt_next_question(self, next_question: Dict, last_user_response: str, conversation_history: List[Dict], resume_data: Dict) -> Dict:
         """
         Rewrite the next question template to blend in a smooth conversational transition
         based on the candidate's last answer, simulating real-world interviews.
         """
-        recent_context = conversation_history[-4:] if len(conversation_history) > 4 else conversation_history
-        context_text = "\n".join([f"{msg.get('type', 'message')}: {msg.get('text', '')}" for msg in recent_context])
-        
-        prompt = f"""
-        You are an elite corporate technical and behavioral interviewer. You are transitioning the candidate to the next question.
-        
-        Last Candidate Response: "{last_user_response}"
-        Next Question Template: "{next_question.get('question_text', '')}"
-        Next Question Type: "{next_question.get('question_type', '')}"
-        Next Question Difficulty: "{next_question.get('difficulty', '')}"
-        Candidate Resume Skills: {', '.join(resume_data.get('skills', []))}
-        
-        Recent Dialogue History:
-        {context_text}
-        
-        Your Goal:
-        Rewrite the "Next Question Template" to create a highly professional, adaptive next question.
-        1. Start with a natural, brief conversational transition acknowledging the candidate's last answer/points. (Do not say "Excellent job" or sound robotic; make it organic like a human interviewer. e.g. "That makes sense, especially regarding how you handle concurrency. Pivoting a bit...")
-        2. Introduce the core topic of the Next Question Template. You may slightly tailor the context of the question to match the candidate's resume skills if it makes the question more relevant.
-        3. Do NOT change the target difficulty or the core concept of the original question.
-        4. Keep the question concise and clear (maximum 2-3 sentences).
-        5. CRITICAL CONSTRAINT: If the candidate's last response was off-topic, unrelated, or skipped, do NOT attempt to connect it to the next question. Instead, use a standard transition like "Moving on to the next question..." and ask the next question exactly as templated, without any tailoring to the off-topic subject.
-        6. CRITICAL CONSTRAINT: The rewritten question MUST be a professional interview question focusing entirely on the technical or behavioral topic of the "Next Question Template". Never ask about non-professional, general knowledge, or off-topic subjects.
-        
-        Return response in this JSON format:
-        {{
-            "question_text": "The rewritten question text with transition",
-            "expected_answer_points": ["point1", "point2", "point3"]
-        }}
-        """
+        context_text = "\n".join(f"{msg.get('type', 'message')}: {msg.get('text', '')}" for msg in _recent_messages(conversation_history, 4))
+        
+        prompt = _ADAPT_PROMPT_TMPL.format_map({
+            'question_text': next_question.get('question_text', ''),
+            'question_type': next_question.get('question_type', ''),
+            'difficulty': next_question.get('difficulty', ''),
+            'skills': ', '.join(resume_data.get('skills', [])),
+            'context': context_text,
+            'user_response': last_user_response
+        })
         try:
-            response = self.model.generate_content(prompt)
-            data = self._parse_single_json_response(response.text)
+            data = await _generate(self.model, prompt, self._parse_single_json_response, _JSON_CONFIG)
             if data and data.get("question_text"):
                 return {
                     "question_text": data["question_text"],
                     "expected_answer_points": data.get("expected_answer_points", next_question.get("expected_answer_points", []))
                 }
         except Exception as e:
-            print(f"Error adapting next question: {e}")
+            logger.warning("Error adapting next question: %s", e)
         
         return {
             "question_text": next_question.get("question_text", ""),
@@ -223,44 +603,14 @@ class AIQuestionGenerator:
         }
 
     def _parse_single_json_response(self, response_text: str) -> Dict:
-        try:
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                return json.loads(json_str)
-            return {}
-        except:
-            return {}
+        return _extract_json(response_text, '{') or {}
     
     def _parse_json_response(self, response_text: str) -> List[Dict]:
-        try:
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                return json.loads(json_str)
-            else:
-                return []
-        except:
-            return []
+        return _extract_json(response_text, '[') or []
     
     def _fallback_technical_questions(self, skills: List[str], difficulty: DifficultyLevel) -> List[Question]:
-        fallback_questions = {
-            DifficultyLevel.ENTRY: [
-                "What is {skill} and how have you used it?",
-                "Can you explain a simple project you built with {skill}?"
-            ],
-            DifficultyLevel.MID: [
-                "Describe a challenging problem you solved using {skill}",
-                "How do you ensure code quality when working with {skill}?"
-            ],
-            DifficultyLevel.SENIOR: [
-                "How would you architect a large-scale system using {skill}?",
-                "What are the performance considerations when using {skill}?"
-            ]
-        }
-        
         questions = []
-        templates = fallback_questions.get(difficulty, fallback_questions[DifficultyLevel.ENTRY])
+        templates = _FALLBACK_TECHNICAL.get(difficulty, _FALLBACK_TECHNICAL[DifficultyLevel.ENTRY])
         
         for i, skill in enumerate(skills[:2]):
             if i < len(templates):
@@ -277,26 +627,8 @@ class AIQuestionGenerator:
         return questions
     
     def _fallback_behavioral_questions(self, difficulty: DifficultyLevel) -> List[Question]:
-        fallback_questions = {
-            DifficultyLevel.ENTRY: [
-                "Tell me about a time you learned something new quickly",
-                "Describe a situation where you worked effectively in a team",
-                "How do you handle feedback and criticism?"
-            ],
-            DifficultyLevel.MID: [
-                "Tell me about a time you had to lead a project or initiative",
-                "Describe a situation where you had to resolve a conflict",
-                "How do you prioritize tasks when facing multiple deadlines?"
-            ],
-            DifficultyLevel.SENIOR: [
-                "Tell me about a time you made a strategic decision that impacted your team",
-                "Describe how you mentor and develop junior team members",
-                "How do you handle situations where you disagree with senior management?"
-            ]
-        }
-        
         questions = []
-        templates = fallback_questions.get(difficulty, fallback_questions[DifficultyLevel.ENTRY])
+        templates = _FALLBACK_BEHAVIORAL.get(difficulty, _FALLBACK_BEHAVIORAL[DifficultyLevel.ENTRY])
         
         for i, template in enumerate(templates):
             question = Question(
@@ -330,26 +662,39 @@ class AIQuestionGenerator:
 
 class ConversationManager:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model = _MODEL
+        self._intent_handlers = {
+            "confirm_end_interview": self._confirm_end_interview,
+            "provide_hint": self._hint_response,
+            "repeat_question": self._repeat_question,
+            "clarify_question": self._clarification_response,
+            "skip_question": self._skip_question,
+            "adjust_pace": self._adjust_pace,
+            "provide_example": self._example_response
+        }
+    
+    def _awaiting_end_confirmation(self, conversation_history: List[Dict]) -> bool:
+        for msg in reversed(conversation_history or []):
+            msg_type = msg.get("type", "").lower()
+            msg_text = msg.get("text", "").lower()
+            if ("ai" in msg_type or "assistant" in msg_type) and "are you sure you want to end the interview early" in msg_text:
+                return True
+        return False
     
-    async def process_user_input(self, user_input: str, current_question: str, conversation_history: List[Dict], question_context: Dict = None) -> Dict:
+    async def process_user_input(self, user_input: str, current_question: str, conversation_history: List[Dict], question_context: Dict = None, stream: bool = False, analysis=None) -> Dict:
         """
-        Process user input and determine appropriate AI response with full conversational intelligence
+        Process user input and determine appropriate AI response with full conversational intelligence.
+        With stream=True, free-text helper replies are returned as an async iterator under "response_stream".
+        With an analysis coroutine factory, turns that reach the LLM answer analysis start it alongside
+        and return its task under "analysis_task"; the caller owns (awaits or cancels) the task.
         """
+        # Lowercase and tokenize once; the helpers below reuse these
         user_input_lower = user_input.lower().strip()
+        tokens = user_input.split()
         
         # 1. Handle confirmation of early termination first
-        is_confirming_end = False
-        if conversation_history:
-            for msg in reversed(conversation_history):
-                msg_type = msg.get("type", "").lower()
-                msg_text = msg.get("text", "").lower()
-                if ("ai" in msg_type or "assistant" in msg_type) and "are you sure you want to end the interview early" in msg_text:
-                    is_confirming_end = True
-                    break
-        
-        if is_confirming_end:
-            if any(phrase in user_input_lower for phrase in ['yes', 'yep', 'yeah', 'sure', 'confirm', 'end', 'stop', 'correct', 'do it']):
+        if self._awaiting_end_confirmation(conversation_history):
+            if _CONFIRM_END_RE.search(user_input_lower):
                 return {
                     "action": "end_interview_confirmed",
                     "response": "Alright, I understand. I will end our session now and save your progress. Thank you for your time, and you'll receive your feedback shortly.",
@@ -364,69 +709,12 @@ class ConversationManager:
                     "needs_follow_up": False
                 }
         
-        # 2. Check for early termination trigger
-        if any(phrase in user_input_lower for phrase in ['end the interview', 'stop the interview', 'terminate', 'quit', 'finish early', 'leave the interview', 'stop now', 'can we end', 'i want to end', 'exit interview']):
-            return {
-                "action": "confirm_end_interview",
-                "response": "Are you sure you want to end the interview early? If you end now, I will save your responses and generate feedback based on what we've completed so far. Please say 'Yes, end the interview' to confirm, or 'No' to continue.",
-                "continue_listening": True,
-                "needs_follow_up": False
-            }
-
-        # 3. Check for hint request
-        if any(phrase in user_input_lower for phrase in ['hint', 'give me a hint', 'clue', 'help me with this', 'stuck', 'give me a clue', 'any tips']):
-            hint = await self._provide_hint(current_question, question_context)
-            return {
-                "action": "provide_hint",
-                "response": hint,
-                "continue_listening": True,
-                "needs_follow_up": False
-            }
-
-        # 4. Handle other conversational helpers - HIGHEST PRIORITY
-        if any(phrase in user_input_lower for phrase in ['repeat', 'again', 'say that again', 'repeat question', 'what was the question', 'can you repeat']):
-            return {
-                "action": "repeat_question",
-                "response": f"Of course! Let me repeat the question: {current_question}",
-                "continue_listening": True,
-                "needs_follow_up": False
-            }
-        
-        if any(phrase in user_input_lower for phrase in ['clarify', 'explain', 'what do you mean', 'unclear', 'confused', 'don\'t understand', 'rephrase']):
-            clarification = await self._clarify_question(current_question, question_context)
-            return {
-                "action": "clarify_question", 
-                "response": clarification,
-                "continue_listening": True,
-                "needs_follow_up": False
-            }
-            
-        if any(phrase in user_input_lower for phrase in ['skip', 'next question', 'pass', 'i don\'t know', 'no idea', 'not sure']):
-            return {
-                "action": "skip_question",
-                "response": "I understand. That's perfectly fine. Let me give you a moment to think, or we can move on to the next question. What would you prefer?",
-                "continue_listening": True,
-                "needs_follow_up": False
-            }
-        
-        if any(phrase in user_input_lower for phrase in ['slow down', 'too fast', 'speak slower']):
-            return {
-                "action": "adjust_pace",
-                "response": "I'll speak more slowly. Let me repeat the question at a comfortable pace: " + current_question,
-                "continue_listening": True,
-                "needs_follow_up": False
-            }
-        
-        if any(phrase in user_input_lower for phrase in ['example', 'give me an example', 'for instance', 'what do you mean by']):
-            example_response = await self._provide_example(current_question, question_context)
-            return {
-                "action": "provide_example",
-                "response": example_response,
-                "continue_listening": True,
-                "needs_follow_up": False
-            }
+        # 2. Early termination, hints and other conversational helpers, matched in a single scan
+        intent = _match_intent(user_input_lower)
+        if intent:
+            return await self._intent_handlers[intent](current_question, question_context, stream)
         
-        if len(user_input.split()) < 3:
+        if len(tokens) < 3:
             return {
                 "action": "encourage_elaboration",
                 "response": "I'd love to hear more about that. Could you elaborate and give me more details about your thoughts or experience?",
@@ -434,9 +722,72 @@ class ConversationManager:
                 "needs_follow_up": True
             }
         
-        return await self._analyze_answer_intelligently(user_input, current_question, conversation_history, question_context)
+        if analysis is None:
+            return await self._analyze_answer_intelligently(user_input, current_question, conversation_history, question_context, len(tokens), user_input_lower)
+        
+        analysis_task = asyncio.create_task(analysis())
+        try:
+            result = await self._analyze_answer_intelligently(user_input, current_question, conversation_history, question_context, len(tokens), user_input_lower)
+        except BaseException:
+            analysis_task.cancel()
+            raise
+        return {**result, "analysis_task": analysis_task}
+    
+    async def _confirm_end_interview(self, current_question: str, question_context: Dict = None, stream: bool = False) -> Dict:
+        return {
+            "action": "confirm_end_interview",
+            "response": "Are you sure you want to end the interview early? If you end now, I will save your responses and generate feedback based on what we've completed so far. Please say 'Yes, end the interview' to confirm, or 'No' to continue.",
+            "continue_listening": True,
+            "needs_follow_up": False
+        }
+    
+    async def _hint_response(self, current_question: str, question_context: Dict = None, stream: bool = False) -> Dict:
+        return await self._text_response("provide_hint", self._provide_hint(current_question, question_context), stream)
+    
+    async def _repeat_question(self, current_question: str, question_context: Dict = None, stream: bool = False) -> Dict:
+        return {
+            "action": "repeat_question",
+            "response": f"Of course! Let me repeat the question: {current_question}",
+            "continue_listening": True,
+            "needs_follow_up": False
+        }
+    
+    async def _clarification_response(self, current_question: str, question_context: Dict = None, stream: bool = False) -> Dict:
+        return await self._text_response("clarify_question", self._clarify_question(current_question, question_context), stream)
+    
+    async def _skip_question(self, current_question: str, question_context: Dict = None, stream: bool = False) -> Dict:
+        return {
+            "action": "skip_question",
+            "response": "I understand. That's perfectly fine. Let me give you a moment to think, or we can move on to the next question. What would you prefer?",
+            "continue_listening": True,
+            "needs_follow_up": False
+        }
+    
+    async def _adjust_pace(self, current_question: str, question_context: Dict = None, stream: bool = False) -> Dict:
+        return {
+            "action": "adjust_pace",
+            "response": "I'll speak more slowly. Let me repeat the question at a comfortable pace: " + current_question,
+            "continue_listening": True,
+            "needs_follow_up": False
+        }
     
-    async def _provide_hint(self, question: str, question_context: Dict = None) -> str:
+    async def _example_response(self, current_question: str, question_context: Dict = None, stream: bool = False) -> Dict:
+        return await self._text_response("provide_example", self._provide_example(current_question, question_context), stream)
+    
+    async def _text_response(self, action: str, chunks, stream: bool) -> Dict:
+        result = {
+            "action": action,
+            "continue_listening": True,
+            "needs_follow_up": False
+        }
+        if stream:
+            result["response_stream"] = chunks
+        else:
+            result["response"] = "".join([text async for text in chunks]).strip()
+        return result
+    
+    async def _provide_hint(self, question: str, question_context: Dict = None):
+        question = _normalize_question(question)
         expected_info = ""
         if question_context and question_context.get("expected_answer_points"):
             expected_info = f"Expected Points: {', '.join(question_context.get('expected_answer_points', []))}"
@@ -450,13 +801,12 @@ class ConversationManager:
         2. Encourages them to explain their thinking.
         3. Is concise (1-2 sentences).
         """
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            return "Try to think about the core concepts involved, or walk me through your initial thoughts and we can build from there."
+        fallback = "Try to think about the core concepts involved, or walk me through your initial thoughts and we can build from there."
+        async for text in _stream_with_fallback(self.model, prompt, fallback):
+            yield text
 
-    async def _clarify_question(self, question: str, question_context: Dict = None) -> str:
+    async def _clarify_question(self, question: str, question_context: Dict = None):
+        question = _normalize_question(question)
         context_info = ""
         if question_context:
             context_info = f"Question Type: {question_context.get('question_type', '')}\nExpected Areas: {', '.join(question_context.get('expected_answer_points', []))}"
@@ -476,13 +826,12 @@ class ConversationManager:
         Keep the clarification concise (2-3 sentences) and help the candidate understand what you're looking for.
         """
         
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            return f"Let me clarify that question for you. {question} - I'm looking for your personal experience, thoughts, or approach to this topic. Take your time and share what comes to mind."
+        fallback = f"Let me clarify that question for you. {question} - I'm looking for your personal experience, thoughts, or approach to this topic. Take your time and share what comes to mind."
+        async for text in _stream_with_fallback(self.model, prompt, fallback):
+            yield text
     
-    async def _provide_example(self, question: str, question_context: Dict = None) -> str:
+    async def _provide_example(self, question: str, question_context: Dict = None):
+        question = _normalize_question(question)
         prompt = f"""
         A candidate has asked for an example to better understand this interview question: "{question}"
         
@@ -495,72 +844,35 @@ class ConversationManager:
         Keep it concise and helpful.
         """
         
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            return f"For example, if I were answering this question, I might talk about a specific situation, the actions I took, and the outcome. Now, I'd like to hear about your own experience with this topic."
+        fallback = f"For example, if I were answering this question, I might talk about a specific situation, the actions I took, and the outcome. Now, I'd like to hear about your own experience with this topic."
+        async for text in _stream_with_fallback(self.model, prompt, fallback):
+            yield text
     
-    async def _analyze_answer_intelligently(self, user_input: str, current_question: str, conversation_history: List[Dict], question_context: Dict = None) -> Dict:
+    async def _analyze_answer_intelligently(self, user_input: str, current_question: str, conversation_history: List[Dict], question_context: Dict, word_count: int, user_input_lower: str) -> Dict:
         # Get recent conversation context
-        recent_context = conversation_history[-6:] if len(conversation_history) > 6 else conversation_history
-        context_text = "\n".join([f"{msg['type']}: {msg['text']}" for msg in recent_context])
+        context_text = "\n".join(f"{msg['type']}: {msg['text']}" for msg in _recent_messages(conversation_history, 6))
         
         # Build context information
         question_info = ""
         if question_context:
-            question_info = f"""
-            Question Type: {question_context.get('question_type', '')}
-            Difficulty Level: {question_context.get('difficulty', '')}
-            Expected Points: {', '.join(question_context.get('expected_answer_points', []))}
-            """
+            question_info = (
+                f"Question Type: {question_context.get('question_type', '')}\n"
+                f"Difficulty Level: {question_context.get('difficulty', '')}\n"
+                f"Expected Points: {', '.join(question_context.get('expected_answer_points', []))}\n"
+            )
         
-        prompt = f"""
-        You are an experienced, adaptive AI interviewer analyzing a candidate's response. Be conversational, supportive, but honest in your analysis.
-
-        Current Question: {current_question}
-        {question_info}
-        
-        Candidate's Answer: {user_input}
-        
-        Recent Conversation Context:
-        {context_text}
-
-        Analyze this response and determine the most appropriate next action. Return JSON in this exact format:
-        {{
-            "action": "continue|follow_up|provide_feedback|encourage_more|correct_misunderstanding|move_next",
-            "response_quality": "excellent|good|fair|poor|off_topic|wrong",
-            "is_relevant": true/false,
-            "completeness_score": 1-10,
-            "accuracy_score": 1-10,
-            "needs_follow_up": true/false,
-            "ai_response": "What you should say next - be conversational and adaptive",
-            "follow_up_question": "Specific follow-up question if needed",
-            "feedback": "Brief encouraging feedback",
-            "next_action": "continue_listening|move_to_next_question"
-        }}
-
-        AI Response Guidelines & Strict Context Constraints:
-        - CRITICAL CONSTRAINT: Under no circumstances should you engage in chit-chat, talk about unrelated topics (such as food/cooking, recipes, sports, hobbies, movies, weather, etc.), or answer unrelated questions.
-        - OFF-TOPIC DEFINITION: Any response that does not attempt to answer the current interview question or talks about unrelated concepts (e.g., food/cooking, sports, hobbies, personal chit-chat, asking the interviewer personal/philosophical questions) is strictly OFF-TOPIC.
-        - If the candidate's answer is OFF-TOPIC: You must set "action" to "redirect_off_topic", set "response_quality" to "off_topic", set "needs_follow_up" to true, and set "ai_response" to a polite but firm redirection back to the active interview question. e.g., "I see. Let's make sure we stay focused on our interview topic. To get back on track, let me repeat the question: [repeat question]"
-        - Keep all follow-up questions strictly scoped to the active interview question's technical/behavioral domain. Do not deviate to any unrelated topics.
-        - If answer is WRONG or POOR: Provide gentle correction, explain the right approach, then ask a clarifying question
-        - If answer is INCOMPLETE: Ask for more details or examples
-        - If answer is GOOD/EXCELLENT: Acknowledge strengths and move forward
-        - Be conversational and natural, like a real interviewer
-        - Show you're listening by referencing their specific points
-        - For wrong answers, say something like: "I appreciate your effort, but let me help clarify this concept..." or "That's not quite right, let me explain..."
-        - For good answers: "Excellent point about...", "That's a solid approach..."
-        - Adapt your language to match the candidate's communication style
-        """
+        prompt = _ANSWER_PROMPT_TMPL.format_map({
+            'question': current_question,
+            'question_info': question_info,
+            'context': context_text,
+            'user_response': user_input
+        })
         
         try:
-            response = self.model.generate_content(prompt)
-            result = self._parse_json_response(response.text)
+            result = await _generate(self.model, prompt, self._parse_json_response, _JSON_CONFIG)
             
             if not result:
-                return self._fallback_intelligent_analysis(user_input, current_question)
+                return self._fallback_intelligent_analysis(word_count, user_input_lower)
             
             return {
                 "action": result.get("action", "continue"),
@@ -575,115 +887,58 @@ class ConversationManager:
             }
             
         except Exception as e:
-            print(f"Intelligence analysis error: {e}")
-            return self._fallback_intelligent_analysis(user_input, current_question)    
+            logger.warning("Intelligence analysis error: %s", e)
+            return self._fallback_intelligent_analysis(word_count, user_input_lower)    
 
-    def _fallback_intelligent_analysis(self, user_input: str, current_question: str) -> Dict:
-        word_count = len(user_input.split())
-        
+    def _fallback_intelligent_analysis(self, word_count: int, user_input_lower: str) -> Dict:
         # Check for common wrong answer indicators
-        wrong_indicators = ['i dont know', 'no idea', 'not sure', 'maybe', 'i think', 'probably']
-        has_uncertainty = any(indicator in user_input.lower() for indicator in wrong_indicators)
+        has_uncertainty = bool(_UNCERTAIN_RE.search(user_input_lower))
         
-        if word_count < 5 or has_uncertainty:
-            return {
-                "action": "provide_feedback",
-                "response": "I can see you're uncertain about this. Let me help clarify the concept and give you another chance to think about it. This is a common area that many candidates find challenging.",
-                "continue_listening": True,
-                "needs_follow_up": True,
-                "response_quality": "poor"
-            }
-        elif word_count < 15:
-            return {
-                "action": "encourage_more", 
-                "response": "That's a good start! I can see you understand some aspects. Could you elaborate more and perhaps give me a specific example or walk me through your thought process?",
-                "continue_listening": True,
-                "needs_follow_up": True,
-                "response_quality": "fair"
-            }
-        else:
-            return {
-                "action": "continue",
-                "response": "Thank you for that comprehensive answer. I can see you have good knowledge in this area and you've explained your thinking clearly.",
-                "continue_listening": False,
-                "needs_follow_up": False,
-                "response_quality": "good"
-            }
+        band = 0 if has_uncertainty else bisect_right(_FALLBACK_INTELLIGENT_BOUNDS, word_count)
+        return dict(_FALLBACK_INTELLIGENT_RESULTS[band])
 
     def _parse_json_response(self, response_text: str) -> Dict:
-        try:
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                return json.loads(json_str)
-            return {}
-        except:
-            return {}
+        return _extract_json(response_text, '{') or {}
 
 class ResponseAnalyzer:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model = _MODEL
     
     async def analyze_response(self, question: str, user_response: str, expected_points: List[str]) -> Dict:
-        prompt = f"""
-        Analyze this interview response comprehensively:
-        
-        Question: {question}
-        Response: {user_response}
-        Expected Key Points: {', '.join(expected_points)}
-        
-        Provide analysis in JSON format:
-        {{
-            "completeness_score": 0-10,
-            "accuracy_score": 0-10,
-            "clarity_score": 0-10,
-            "relevance_score": 0-10,
-            "depth_score": 0-10,
-            "missing_points": ["point1", "point2"],
-            "strengths": ["strength1", "strength2"],
-            "areas_for_improvement": ["improvement1", "improvement2"],
-            "overall_feedback": "Comprehensive feedback summary",
-            "follow_up_needed": true/false,
-            "suggested_follow_up": "follow up question if needed"
-        }}
+        return await self._analyze(question, user_response, expected_points) or self._fallback_analysis(user_response)
+    
+    async def analyze_cached(self, question: Dict, user_response: str) -> Dict:
         """
+        Analyze a response to a stored question. Replayed answers build the same prompt,
+        so the analysis cache serves them without another model call
+        """
+        return await self.analyze_response(
+            question["question_text"],
+            user_response,
+            question.get("expected_answer_points", [])
+        )
+    
+    async def _analyze(self, question: str, user_response: str, expected_points: List[str]) -> Optional[Dict]:
+        prompt = _ANALYSIS_PROMPT_TMPL.format_map({
+            'question': question,
+            'expected_points': ', '.join(expected_points),
+            'user_response': user_response
+        })
         
         try:
-            response = self.model.generate_content(prompt)
-            return self._parse_analysis_response(response.text)
+            # Parsing inside _generate keeps unparseable replies out of the analysis cache
+            analysis = await _generate(self.model, prompt, self._parse_analysis, _JSON_CONFIG, analysis_cache)
+            return analysis or None
         except Exception as e:
-            return self._fallback_analysis(user_response)
+            logger.warning("Response analysis failed: %s", e)
+            return None
     
-    def _parse_analysis_response(self, response_text: str) -> Dict:
-        try:
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                return json.loads(json_str)
-            else:
-                return self._fallback_analysis("")
-        except:
-            return self._fallback_analysis("")
+    def _parse_analysis(self, response_text: str) -> Dict:
+        return _extract_json(response_text, '{') or {}
     
     def _fallback_analysis(self, user_response: str) -> Dict:
         response_length = len(user_response.split())
-        
-        if response_length < 10:
-            completeness = 3
-            clarity = 4
-            depth = 2
-        elif response_length < 30:
-            completeness = 6
-            clarity = 7
-            depth = 5
-        elif response_length < 60:
-            completeness = 8
-            clarity = 8
-            depth = 7
-        else:
-            completeness = 9
-            clarity = 8
-            depth = 8
+        completeness, clarity, depth = _FALLBACK_SCORES[bisect_right(_FALLBACK_SCORE_BOUNDS, response_length)]
         
         return {
             "completeness_score": completeness,
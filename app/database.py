@@ -1,5 +1,4 @@
-from pymongo import MongoClient
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 import os
 from dotenv import load_dotenv
 import certifi
@@ -9,11 +8,15 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "ai_interviewer")
 
-client = MongoClient(MONGODB_URL, tlsCAFile=certifi.where())
-database: Database = client[DATABASE_NAME]
+client = AsyncIOMotorClient(MONGODB_URL, tlsCAFile=certifi.where(), maxPoolSize=50)
+database: AsyncIOMotorDatabase = client[DATABASE_NAME]
 
 def get_database():
     return database
 
+async def create_indexes():
+    await database.interviews.create_index("resume_id")
+    await database.feedback.create_index("interview_id")
+
 def close_database_connection():
     client.close()
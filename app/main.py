@@ -1,13 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 load_dotenv()
 
 from .routes import router
-from .database import close_database_connection
+from .database import create_indexes, close_database_connection
+from .resume_parser import shutdown_pdf_pool
+from .responses import MongoJSONResponse
+from bson.errors import InvalidId
+import logging
 import uvicorn
 
-app = FastAPI(title="AI Interviewer API", version="1.0.0")
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="AI Interviewer API", version="1.0.0", default_response_class=MongoJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,13 +26,28 @@ app.add_middleware(
 
 app.include_router(router, prefix="/api")
 
+@app.exception_handler(InvalidId)
+async def invalid_id_handler(request: Request, exc: InvalidId):
+    return MongoJSONResponse(status_code=400, content={"detail": "Invalid id"})
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    # Log the details server-side instead of leaking them in the response
+    logger.exception("Unhandled error on %s %s", request.method, request.url.path)
+    return MongoJSONResponse(status_code=500, content={"detail": "Internal server error"})
+
 @app.get("/")
 async def root():
     return {"message": "AI Interviewer API is running"}
 
+@app.on_event("startup")
+async def startup_event():
+    await create_indexes()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     close_database_connection()
+    shutdown_pdf_pool()
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any, Annotated, Union
-from datetime import datetime
+from datetime import datetime, timezone
 from bson import ObjectId
 from enum import Enum
 from pydantic import AfterValidator, PlainSerializer, WithJsonSchema
@@ -19,6 +19,9 @@ PyObjectId = Annotated[
     WithJsonSchema({"type": "string"}, mode="serialization"),
 ]
 
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
 class DifficultyLevel(str, Enum):
     ENTRY = "entry"
     MID = "mid"
@@ -40,9 +43,12 @@ class Resume(BaseModel):
     skills: List[str] = []
     experience: List[str] = []
     education: List[str] = []
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
 
 class Question(BaseModel):
+    # Frozen only guards against writes; the list fields keep instances unhashable
+    model_config = ConfigDict(frozen=True)
+    
     id: str
     question_text: str
     question_type: QuestionType
@@ -51,11 +57,13 @@ class Question(BaseModel):
     follow_up_questions: List[str] = []
 
 class InterviewResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     question_id: str
     question_text: str
     user_response: str
     response_time: int
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utc_now)
 
 class InterviewSession(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True, populate_by_name=True)
@@ -66,7 +74,7 @@ class InterviewSession(BaseModel):
     questions: List[Question] = []
     responses: List[InterviewResponse] = []
     status: str = "pending"
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
     completed_at: Optional[datetime] = None
 
 class InterviewFeedback(BaseModel):
@@ -79,7 +87,7 @@ class InterviewFeedback(BaseModel):
     improvements: List[str] = []
     detailed_feedback: str
     transcription: List[Dict[str, str]] = []
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
 
 class InterviewConfig(BaseModel):
     difficulty: DifficultyLevel
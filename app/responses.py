@@ -0,0 +1,16 @@
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+from typing import Any
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class MongoJSONResponse(ORJSONResponse):
+    """
+    orjson-encoded response that also serializes ObjectIds, so MongoDB documents can be returned as-is
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,112 @@
+import asyncio
+import io
+import logging
+import os
+import multiprocessing
+import re
+import ahocorasick
+import pypdf
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PROGRAMMING_LANGUAGES = ["python", "javascript", "java", "c++", "c#", "ruby", "php", "swift", "kotlin", "go", "rust", "typescript"]
+_FRAMEWORKS = ["react", "angular", "vue", "django", "flask", "fastapi", "express", "spring", "laravel", "rails"]
+_DATABASES = ["mysql", "postgresql", "mongodb", "redis", "sqlite", "oracle", "cassandra"]
+_CLOUD_TOOLS = ["aws", "azure", "gcp", "docker", "kubernetes", "jenkins", "git", "gitlab", "github"]
+_CONCEPTS = ["machine learning", "data science", "blockchain", "api", "microservices", "devops", "agile", "scrum"]
+
+_SKILLS_LOWER_TO_TITLE = {
+    skill.lower(): skill.title()
+    for skill in _PROGRAMMING_LANGUAGES + _FRAMEWORKS + _DATABASES + _CLOUD_TOOLS + _CONCEPTS
+}
+
+# Built once at import: maps each lowercase skill to its display form
+_SKILL_AUTOMATON = ahocorasick.Automaton()
+for _skill_lower, _skill_title in _SKILLS_LOWER_TO_TITLE.items():
+    _SKILL_AUTOMATON.add_word(_skill_lower, _skill_title)
+_SKILL_AUTOMATON.make_automaton()
+
+# Keywords are matched as whole words, so nouns carry their plural forms too
+_EXPERIENCE_KEYWORDS = frozenset(['worked', 'developed', 'managed', 'led', 'created', 'designed', 'implemented', 'built', 'maintained', 'deployed'])
+_EXPERIENCE_EXCLUSIONS = frozenset([
+    'university', 'universities', 'college', 'colleges', 'school', 'schools', 'education'
+])
+_EDUCATION_KEYWORDS = frozenset([
+    'university', 'universities', 'college', 'colleges', 'degree', 'degrees', 'bachelor', 'bachelors',
+    'master', 'masters', 'phd', 'diploma', 'diplomas', 'certification', 'certifications', 'institute', 'institutes'
+])
+_WORD_RE = re.compile(r"[a-z]+")
+_MIN_LINE_LENGTH = 15
+
+def parse_resume(text: str) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Extract skills, experience and education from resume text, lowercasing it and splitting lines once
+    """
+    # One Aho-Corasick pass over the text finds every skill, overlapping matches included.
+    # dict.fromkeys dedupes in order of appearance, so the same resume always yields the same
+    # skill list and the question prompts built from it hit the prompt cache
+    skills = list(dict.fromkeys(skill for _, skill in _SKILL_AUTOMATON.iter(text.lower())))
+    
+    # Lines too short for either classifier are dropped before paying for lowercasing
+    lines_clean = [line for line in (raw.strip() for raw in text.splitlines()) if len(line) > _MIN_LINE_LENGTH]
+    lines_lower = [line.lower() for line in lines_clean]
+    
+    experience = []
+    education = []
+    for line_clean, line_lower in zip(lines_clean, lines_lower):
+        words = set(_WORD_RE.findall(line_lower))
+        if len(experience) < 5 and len(line_clean) > 30 and words & _EXPERIENCE_KEYWORDS:
+            if not words & _EXPERIENCE_EXCLUSIONS:
+                experience.append(line_clean)
+        
+        if len(education) < 3 and words & _EDUCATION_KEYWORDS:
+            education.append(line_clean)
+        
+        if len(experience) == 5 and len(education) == 3:
+            break
+    
+    return skills, experience, education
+
+def extract_resume(contents: bytes) -> Tuple[str, int, List[str], List[str], List[str]]:
+    """
+    Extract the text of a PDF resume and parse it, returning (text, page_count, skills, experience, education)
+    """
+    pdf_reader = pypdf.PdfReader(io.BytesIO(contents))
+    text_content = "".join([page.extract_text() or "" for page in pdf_reader.pages])
+    skills, experience, education = parse_resume(text_content)
+    return text_content, len(pdf_reader.pages), skills, experience, education
+
+# Top-level functions above are picklable, so uploads can be parsed across cores. Workers are
+# spawned rather than forked: the server process already runs Motor and asyncio threads, and a
+# forked child could inherit one of their locks mid-acquire. Every uvicorn worker builds its own
+# pool, so the size is capped rather than one process per core.
+PDF_POOL_MAX_WORKERS = int(os.getenv("PDF_POOL_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+
+def _new_pdf_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=PDF_POOL_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+pdf_pool = _new_pdf_pool()
+
+async def extract_resume_in_pool(contents: bytes) -> Tuple[str, int, List[str], List[str], List[str]]:
+    """
+    Run extract_resume in the worker pool. A worker that dies (e.g. OOM-killed on a hostile PDF)
+    breaks the whole executor, so the pool is replaced and the upload retried once
+    """
+    global pdf_pool
+    loop = asyncio.get_running_loop()
+    pool = pdf_pool
+    try:
+        return await loop.run_in_executor(pool, extract_resume, contents)
+    except BrokenProcessPool:
+        logger.warning("PDF worker pool broke, starting a new one")
+        # Concurrent uploads may all see the same broken pool; only the first replaces it
+        if pdf_pool is pool:
+            pdf_pool = _new_pdf_pool()
+            pool.shutdown(wait=False)
+        return await loop.run_in_executor(pdf_pool, extract_resume, contents)
+
+def shutdown_pdf_pool():
+    pdf_pool.shutdown()
@@ -1,42 +1,71 @@
 import asyncio
+import logging
+from collections import deque
 from typing import Dict, List
-from .ai_service import ai_generator, response_analyzer, conversation_manager
+from .ai_service import ai_generator, response_analyzer, conversation_manager, question_context
 from .database import get_database
+from .models import utc_now
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 db = get_database()
 
+logger = logging.getLogger(__name__)
+
+RECENT_MESSAGES = 16
+RESPONSE_FLUSH_SIZE = 3
+
 class VoiceInterviewManager:
     def __init__(self):
         self.active_interviews: Dict[str, Dict] = {}
     
+    def _record(self, interview_data: Dict, message: Dict):
+        """Append a message to the full conversation log and to the recent window"""
+        interview_data["conversation"].append(message)
+        interview_data["recent"].append(message)
+    
     async def start_voice_interview(self, interview_id: str):
         try:
-            interview = db.interviews.find_one({"_id": ObjectId(interview_id)})
+            interview_oid = ObjectId(interview_id)
+            # Read the questions and mark the interview in progress in one round trip
+            interview = await db.interviews.find_one_and_update(
+                {"_id": interview_oid, "questions.0": {"$exists": True}},
+                {"$set": {"status": "in_progress", "started_at": utc_now()}},
+                projection={"questions": 1},
+                return_document=ReturnDocument.AFTER
+            )
             if not interview:
                 return None
             
-            print(f"Starting voice interview {interview_id}")
+            logger.info("Starting voice interview %s", interview_id)
             
             self.active_interviews[interview_id] = {
+                "_oid": interview_oid,
                 "current_question_index": 0,
                 "questions": interview["questions"],
+                # Same question dicts as above, indexed for lookups by id
+                "questions_by_id": {q["id"]: q for q in interview["questions"]},
                 "conversation": [],
+                # Bounded tail of the conversation that is fed to the LLM each turn
+                "recent": deque(maxlen=RECENT_MESSAGES),
+                # Analysed responses not yet written to the database
+                "pending_responses": [],
                 "status": "active",
                 "follow_up_count": 0,
                 "current_question_attempts": 0
             }
             
             first_question = interview["questions"][0]
+            now = asyncio.get_running_loop().time()
             
-            self.active_interviews[interview_id]["conversation"].append({
+            self._record(self.active_interviews[interview_id], {
                 "type": "ai_question",
                 "text": first_question["question_text"],
-                "timestamp": asyncio.get_event_loop().time(),
+                "timestamp": now,
                 "question_id": first_question["id"]
             })
             
-            print(f"First question: {first_question['question_text']}")
+            logger.debug("First question: %s", first_question["question_text"])
             
             return {
                 "message": "Voice interview started",
@@ -45,123 +74,133 @@ class VoiceInterviewManager:
                 "total_questions": len(interview["questions"])
             }
         except Exception as e:
-            print(f"Error starting voice interview: {e}")
+            logger.exception("Error starting voice interview: %s", e)
             return None
     
     async def process_voice_response(self, interview_id: str, user_response: str, response_time: int):
         try:
             if interview_id not in self.active_interviews:
-                print(f"Interview {interview_id} not found in active interviews")
+                logger.warning("Interview %s not found in active interviews", interview_id)
                 return {"error": "Interview not found or not active"}
             
             interview_data = self.active_interviews[interview_id]
             current_index = interview_data["current_question_index"]
             
             if current_index >= len(interview_data["questions"]):
-                print(f"No more questions available for interview {interview_id}")
+                logger.warning("No more questions available for interview %s", interview_id)
                 return {"error": "No more questions available"}
             
             current_question = interview_data["questions"][current_index]
+            # One clock read per turn; every message recorded in this turn shares it
+            now = asyncio.get_running_loop().time()
             
-            print(f"Processing response for interview {interview_id}, question {current_index + 1}")
-            print(f"User response: {user_response}")
+            logger.info("Processing response for interview %s, question %d", interview_id, current_index + 1)
+            logger.debug("User response: %s", user_response)
 
-            interview_data["conversation"].append({
+            self._record(interview_data, {
                 "type": "user_response",
                 "text": user_response,
-                "timestamp": asyncio.get_event_loop().time(),
+                "timestamp": now,
                 "question_id": current_question["id"]
             })
 
+            # Turns that reach the LLM answer analysis start the response analysis alongside it;
+            # turns answered by the local checks (hints, short replies) don't pay for a speculative call
             conversation_result = await conversation_manager.process_user_input(
                 user_response,
                 current_question["question_text"],
-                interview_data["conversation"],
-                {
-                    "question_type": current_question.get("question_type"),
-                    "difficulty": current_question.get("difficulty"),
-                    "expected_answer_points": current_question.get("expected_answer_points", [])
-                }
+                list(interview_data["recent"]),
+                question_context(current_question),
+                analysis=lambda: response_analyzer.analyze_cached(current_question, user_response)
             )
-            
-            print(f"Conversation analysis: {conversation_result.get('action', 'unknown')}")
+            analysis_task = conversation_result.pop("analysis_task", None)
+
+            try:
+                logger.info("Conversation analysis: %s", conversation_result.get("action", "unknown"))
 
-            action = conversation_result.get("action", "continue")
+                action = conversation_result.get("action", "continue")
             
-            response_data = {
-                "conversation": interview_data["conversation"],
-                "ai_response": conversation_result["response"]
-            }
+                response_data = {
+                    "conversation": interview_data["conversation"],
+                    "ai_response": conversation_result["response"]
+                }
 
-            if action not in ["repeat_question", "clarify_question", "provide_example", "adjust_pace"]:
-                interview_data["conversation"].append({
-                    "type": "ai_response",
-                    "text": conversation_result["response"],
-                    "timestamp": asyncio.get_event_loop().time(),
-                    "question_id": current_question["id"]
-                })
-            
-            if action in ["repeat_question", "clarify_question", "provide_example", "adjust_pace"]:
+                if action not in ["repeat_question", "clarify_question", "provide_example", "adjust_pace"]:
+                    self._record(interview_data, {
+                        "type": "ai_response",
+                        "text": conversation_result["response"],
+                        "timestamp": now,
+                        "question_id": current_question["id"]
+                    })
+            
+                if action in ["repeat_question", "clarify_question", "provide_example", "adjust_pace"]:
 
-                message_type = "ai_repeat" if action == "repeat_question" else "ai_clarification"
-                interview_data["conversation"].append({
-                    "type": message_type,
-                    "text": conversation_result["response"],
-                    "timestamp": asyncio.get_event_loop().time(),
-                    "question_id": current_question["id"]
-                })
+                    message_type = "ai_repeat" if action == "repeat_question" else "ai_clarification"
+                    self._record(interview_data, {
+                        "type": message_type,
+                        "text": conversation_result["response"],
+                        "timestamp": now,
+                        "question_id": current_question["id"]
+                    })
                 
-                response_data["continue_same_question"] = True
-                response_data["has_follow_up"] = True
-                response_data["follow_up_question"] = conversation_result["response"]
+                    response_data["continue_same_question"] = True
+                    response_data["has_follow_up"] = True
+                    response_data["follow_up_question"] = conversation_result["response"]
                 
-            elif action in ["encourage_elaboration", "encourage_more", "follow_up"] and conversation_result.get("continue_listening", False):
-                interview_data["follow_up_count"] += 1
-                response_data["has_follow_up"] = True
-                response_data["follow_up_question"] = conversation_result["response"]
+                elif action in ["encourage_elaboration", "encourage_more", "follow_up"] and conversation_result.get("continue_listening", False):
+                    interview_data["follow_up_count"] += 1
+                    response_data["has_follow_up"] = True
+                    response_data["follow_up_question"] = conversation_result["response"]
 
-                if interview_data["follow_up_count"] >= 2:
-                    await self._move_to_next_question(interview_data, response_data, interview_id)
+                    if interview_data["follow_up_count"] >= 2:
+                        await self._move_to_next_question(interview_data, response_data, interview_id, now)
                     
-            elif action == "skip_question":
-                await self._move_to_next_question(interview_data, response_data, interview_id)
+                elif action == "skip_question":
+                    await self._move_to_next_question(interview_data, response_data, interview_id, now)
                 
-            elif action in ["continue", "move_next"] or not conversation_result.get("continue_listening", True):
-                await self._save_response_analysis(interview_id, current_question, user_response, response_time, conversation_result)
-                await self._move_to_next_question(interview_data, response_data, interview_id)
+                elif action in ["continue", "move_next"] or not conversation_result.get("continue_listening", True):
+                    if analysis_task is not None:
+                        analysis = await analysis_task
+                    else:
+                        analysis = await response_analyzer.analyze_cached(current_question, user_response)
+                    await self._save_response_analysis(interview_id, current_question, user_response, response_time, conversation_result, analysis, now)
+                    await self._move_to_next_question(interview_data, response_data, interview_id, now)
                 
-            else:
-                response_data["has_follow_up"] = True
-                response_data["follow_up_question"] = conversation_result["response"]
+                else:
+                    response_data["has_follow_up"] = True
+                    response_data["follow_up_question"] = conversation_result["response"]
             
-            return response_data
+                return response_data
+            finally:
+                if analysis_task is not None:
+                    analysis_task.cancel()
             
         except Exception as e:
-            print(f"Error processing voice response: {e}")
+            logger.exception("Error processing voice response: %s", e)
             return {"error": f"Error processing response: {str(e)}"}
     
-    async def _move_to_next_question(self, interview_data: Dict, response_data: Dict, interview_id: str):
+    async def _move_to_next_question(self, interview_data: Dict, response_data: Dict, interview_id: str, now: float):
         """Move to the next question in the interview"""
         interview_data["current_question_index"] += 1
         interview_data["follow_up_count"] = 0  
         next_index = interview_data["current_question_index"]
         
-        print(f"Moving to question {next_index + 1}")
+        logger.info("Moving to question %d", next_index + 1)
         
         if next_index < len(interview_data["questions"]):
             next_question = interview_data["questions"][next_index]
 
             transition_message = "Great! Now let's move on to the next question."
-            interview_data["conversation"].append({
+            self._record(interview_data, {
                 "type": "ai_transition",
                 "text": transition_message,
-                "timestamp": asyncio.get_event_loop().time()
+                "timestamp": now
             })
             
-            interview_data["conversation"].append({
+            self._record(interview_data, {
                 "type": "ai_question",
                 "text": next_question["question_text"],
-                "timestamp": asyncio.get_event_loop().time(),
+                "timestamp": now,
                 "question_id": next_question["id"]
             })
             
@@ -174,74 +213,98 @@ class VoiceInterviewManager:
             interview_data["status"] = "completed"
             completion_message = "Excellent! You've completed all the questions in your interview. You provided thoughtful responses and demonstrated your skills well. Thank you for your time, and you'll receive detailed feedback shortly."
             
-            interview_data["conversation"].append({
+            self._record(interview_data, {
                 "type": "ai_completion",
                 "text": completion_message,
-                "timestamp": asyncio.get_event_loop().time()
+                "timestamp": now
             })
             
             response_data["interview_completed"] = True
             response_data["completion_message"] = completion_message
             
-            print("Interview completed")
+            logger.info("Interview %s completed", interview_id)
             await self.complete_interview(interview_id)
     
-    async def _save_response_analysis(self, interview_id: str, current_question: Dict, user_response: str, response_time: int, conversation_result: Dict):
-        """Save the response with analysis to database"""
+    async def _save_response_analysis(self, interview_id: str, current_question: Dict, user_response: str, response_time: int, conversation_result: Dict, analysis: Dict, now: float):
+        """Buffer the response with its analysis, writing to the database every few responses"""
+        interview_data = self.active_interviews[interview_id]
+        pending = interview_data["pending_responses"]
+        pending.append({
+            "question_id": current_question["id"],
+            "question_text": current_question["question_text"],
+            "user_response": user_response,
+            "response_time": response_time,
+            "analysis": analysis,
+            "conversation_quality": conversation_result.get("response_quality", "fair"),
+            "timestamp": now
+        })
+        if len(pending) < RESPONSE_FLUSH_SIZE:
+            return
+        
+        # Take the batch out before awaiting so a concurrent flush or completion can't push it again
+        flushed = pending[:]
+        pending.clear()
         try:
-            analysis = await response_analyzer.analyze_response(
-                current_question["question_text"],
-                user_response,
-                current_question.get("expected_answer_points", [])
-            )
-            
-            db.interviews.update_one(
-                {"_id": ObjectId(interview_id)},
-                {"$push": {"responses": {
-                    "question_id": current_question["id"],
-                    "question_text": current_question["question_text"],
-                    "user_response": user_response,
-                    "response_time": response_time,
-                    "analysis": analysis,
-                    "conversation_quality": conversation_result.get("response_quality", "fair"),
-                    "timestamp": asyncio.get_event_loop().time()
-                }}}
+            await db.interviews.update_one(
+                {"_id": interview_data["_oid"]},
+                {"$push": {"responses": {"$each": flushed}}}
             )
         except Exception as e:
-            print(f"Error saving response analysis: {e}")
+            logger.exception("Error saving response analysis: %s", e)
+            # Keep the batch, ahead of anything buffered meanwhile, for the next flush
+            pending[:0] = flushed
     
     async def complete_interview(self, interview_id: str):
         try:
             if interview_id in self.active_interviews:
-                conversation = self.active_interviews[interview_id]["conversation"]
+                interview_data = self.active_interviews[interview_id]
+                
+                update = {"$set": {
+                    "status": "completed",
+                    "conversation": interview_data["conversation"],
+                    "completed_at": utc_now()
+                }}
+                # Remaining buffered responses ride on the completion write
+                pending = interview_data["pending_responses"]
+                flushed = pending[:]
+                pending.clear()
+                if flushed:
+                    update["$push"] = {"responses": {"$each": flushed}}
                 
-                db.interviews.update_one(
-                    {"_id": ObjectId(interview_id)},
-                    {"$set": {
-                        "status": "completed",
-                        "conversation": conversation,
-                        "completed_at": asyncio.get_event_loop().time()
-                    }}
-                )
+                try:
+                    await db.interviews.update_one({"_id": interview_data["_oid"]}, update)
+                except Exception:
+                    pending[:0] = flushed
+                    raise
                 
                 del self.active_interviews[interview_id]
-                print(f"Interview {interview_id} completed and cleaned up")
+                logger.info("Interview %s completed and cleaned up", interview_id)
                 return True
             return False
         except Exception as e:
-            print(f"Error completing interview: {e}")
+            logger.exception("Error completing interview: %s", e)
             return False
     
-    def get_conversation(self, interview_id: str):
+    def update_question(self, interview_id: str, question_id: str, updates: Dict):
+        """Mirror a question rewritten in the database into the active session, if there is one"""
+        interview_data = self.active_interviews.get(interview_id)
+        if interview_data is None:
+            return
+        
+        question = interview_data["questions_by_id"].get(question_id)
+        if question is not None:
+            question.update(updates)
+    
+    async def get_conversation(self, interview_id: str):
         if interview_id in self.active_interviews:
             return self.active_interviews[interview_id]["conversation"]
         
         try:
-            interview = db.interviews.find_one({"_id": ObjectId(interview_id)})
+            interview = await db.interviews.find_one({"_id": ObjectId(interview_id)})
             if interview and "conversation" in interview:
                 return interview["conversation"]
         except Exception as e:
-            print(f"Error getting conversation from database: {e}")
+            logger.warning("Error getting conversation from database: %s", e)
         
         return []
 